@@ -161,6 +161,37 @@ def _draw_nodes(
                 _draw_task_group(node, sub, states_by_task_id)
 
 
+def render_dag_structure(dag: DAG | SerializedDAG) -> tuple[set[str], set[tuple[str, str]]]:
+    """
+    Extract the node ids and edges of the DAG without serializing it to DOT.
+
+    Unlike :func:`render_dag`, this skips building the graphviz object and its
+    DOT source entirely, so it is much cheaper when only the graph structure is
+    needed.
+
+    :param dag: DAG that will be inspected.
+    :return: Set of node ids and set of ``(source_id, target_id)`` edges
+    """
+    nodes: set[str] = set()
+
+    def _collect_nodes(node: DependencyMixin) -> None:
+        if isinstance(node, (BaseOperator, MappedOperator, SerializedBaseOperator, SerializedMappedOperator)):
+            nodes.add(node.task_id)
+        else:
+            if not isinstance(node, (SerializedTaskGroup, TaskGroup)):
+                raise AirflowException(f"The node {node} should be TaskGroup and is not")
+            if node.upstream_group_ids or node.upstream_task_ids:
+                nodes.add(node.upstream_join_id)
+            if node.downstream_group_ids or node.downstream_task_ids:
+                nodes.add(node.downstream_join_id)
+            for child in node.children.values():
+                _collect_nodes(child)
+
+    _collect_nodes(dag.task_group)
+    edges = {(edge["source_id"], edge["target_id"]) for edge in dag_edges(dag)}
+    return nodes, edges
+
+
 def render_dag_dependencies(deps: dict[str, list[DagDependency]]) -> graphviz.Digraph:
     """
     Render the DAG dependency to the DOT object.